@@ -1,18 +1,45 @@
+import functools
+import json
 from typing import Optional
+import httplib2
 from google.oauth2 import service_account
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build, Resource
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document, Resource
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import build_http, set_user_agent
 from config import config
 
+# googleapiclient appends "(gzip)" to this and sends Accept-Encoding: gzip,
+# which together make Google APIs return compressed responses
+USER_AGENT = "meeting-cost-calculator"
 
+# Service account key is parsed once; per-user credentials are derived from it
+_BASE_CREDS = service_account.Credentials.from_service_account_info(
+    config.google_credentials_json,
+    scopes=config.scopes
+)
+
+# Calendar discovery document bundled with googleapiclient, parsed once per process
+_CALENDAR_DISCOVERY = json.loads(get_static_doc("calendar", "v3"))
+
+
+def authorized_http(creds: Credentials) -> httplib2.Http:
+    """
+    Create an authorized HTTP transport that identifies this application.
+    build_http() keeps googleapiclient's defaults: a socket timeout and no following of 308 redirects.
+    """
+    return set_user_agent(AuthorizedHttp(creds, http=build_http()), USER_AGENT)
+
+
+@functools.lru_cache(maxsize=config.max_users)
 def impersonated_creds(subject_email: str) -> Credentials:
-    """Create impersonated credentials for a specific user."""
-    creds = service_account.Credentials.from_service_account_info(
-        config.google_credentials_json, 
-        scopes=config.scopes, 
-        subject=subject_email
-    )
-    return creds.with_scopes(config.scopes)
+    """
+    Create impersonated credentials for a specific user.
+    Cached per user so access tokens are reused across cron runs; credentials hold
+    no connection and can be shared between threads.
+    """
+    return _BASE_CREDS.with_subject(subject_email)
 
 
 def admin_creds() -> Credentials:
@@ -20,17 +47,18 @@ def admin_creds() -> Credentials:
     if config.has_admin_subject:
         return impersonated_creds(config.admin_subject)
     else:
-        return service_account.Credentials.from_service_account_info(
-            config.google_credentials_json, 
-            scopes=config.scopes
-        )
+        return _BASE_CREDS
 
 
 def calendar_service(subject_email: str) -> Resource:
-    """Build Calendar API service for a specific user."""
-    return build("calendar", "v3", credentials=impersonated_creds(subject_email), cache_discovery=False)
+    """
+    Build Calendar API service for a specific user.
+    Each call gets its own HTTP connection, so a service must not be shared between threads;
+    the user's cached credentials keep token exchanges to one per token lifetime.
+    """
+    return build_from_document(_CALENDAR_DISCOVERY, http=authorized_http(impersonated_creds(subject_email)))
 
 
 def directory_service() -> Resource:
     """Build Directory API service with admin credentials."""
-    return build("admin", "directory_v1", credentials=admin_creds(), cache_discovery=False)
\ No newline at end of file
+    return build("admin", "directory_v1", http=authorized_http(admin_creds()), cache_discovery=False)
@@ -1,30 +1,60 @@
-import re
+import functools
+import zlib
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Any, Tuple, Optional
-from google.cloud import firestore
+from typing import List, Dict, Any, Tuple, Optional, Iterable, Iterator, Callable
+from google.auth.transport.requests import AuthorizedSession
 from google.oauth2 import service_account
 from auth import calendar_service
 from config import config
 
-# Initialize Firestore with service account credentials
+# Sync tokens are plain key-value documents, so Firestore is accessed through its
+# REST API on a keep-alive session rather than the gRPC client library
 creds = service_account.Credentials.from_service_account_info(
     config.google_credentials_json,
     scopes=['https://www.googleapis.com/auth/datastore']
 )
-db = firestore.Client(credentials=creds, project=config.google_credentials_json['project_id'])
+firestore_session = AuthorizedSession(creds)
+_DATABASE = f"projects/{config.google_credentials_json['project_id']}/databases/(default)"
+_DOCUMENTS_URL = f"https://firestore.googleapis.com/v1/{_DATABASE}/documents"
 
+# Start of an existing cost annotation in an event description
+_TAG_PREFIX = config.cost_tag_prefix
 
-def user_doc(email: str) -> firestore.DocumentReference:
-    """Get Firestore document for storing user sync tokens."""
-    return db.collection("meetingcost").document(email)
+# Maximum number of sub-requests Google accepts in a single batch HTTP request
+BATCH_LIMIT = 50
 
+# Sync tokens of all users are packed into a few shard documents, one field per user,
+# so each cron run reads and writes a handful of documents instead of one per user.
+# Four shards keep 10k users (~150 bytes per token) well under the 1 MiB document limit.
+SYNC_TOKEN_SHARDS = 4
 
-def list_changed_events(cal, calendar_id: str, sync_token: Optional[str]) -> Tuple[Optional[List[Dict]], Optional[str]]:
+# Number of legacy per-user documents read per batchGet call
+LEGACY_GET_CHUNK = 300
+
+
+def user_doc(email: str) -> str:
+    """Get name of the Firestore shard document storing a user's sync token."""
+    shard = zlib.crc32(email.encode()) % SYNC_TOKEN_SHARDS
+    return f"{_DATABASE}/documents/meetingcost/_sync_tokens_{shard}"
+
+
+def legacy_user_doc(email: str) -> str:
+    """Get name of the per-user Firestore document that stored sync tokens before sharding."""
+    return f"{_DATABASE}/documents/meetingcost/{email}"
+
+
+def _field_path(email: str) -> str:
+    """Quote an email for use as a Firestore field path (emails contain '.' and '@')."""
+    return "`" + email.replace("\\", "\\\\").replace("`", "\\`") + "`"
+
+
+def iter_changed_events(cal, calendar_id: str, sync_token: Optional[str]) -> Tuple[Optional[Iterator[Dict]], Optional[Callable[[], Optional[str]]]]:
     """
-    Fetch changed events from Calendar API using sync tokens.
-    Returns (events, next_sync_token) or (None, None) if sync token is invalid.
+    Stream changed events from Calendar API page by page using sync tokens.
+    Returns (events, get_next_sync_token) or (None, None) if sync token is invalid.
+    The first page is fetched up front so an invalid sync token is reported immediately;
+    get_next_sync_token() returns the new token once events has been fully consumed.
     """
-    events = []
     try:
         if sync_token:
             req = cal.events().list(
@@ -46,25 +76,71 @@ def list_changed_events(cal, calendar_id: str, sync_token: Optional[str]) -> Tup
                 maxResults=2500,
                 fields="items(attendees,organizer,id,recurringEventId,start,end,description,extendedProperties),nextPageToken,nextSyncToken"
             )
-        
-        while True:
-            resp = req.execute()
-            events.extend(resp.get("items", []))
-            page = resp.get("nextPageToken")
-            if page:
-                req = cal.events().list_next(req, resp)
-            else:
-                return events, resp.get("nextSyncToken")
+        resp = req.execute()
                 
     except Exception as e:
         # If sync token is stale, caller should drop it and do a windowed resync
         if "syncToken" in str(e) and "full sync" in str(e).lower():
             return None, None
         raise
+    
+    next_sync_token = None
+    
+    def events() -> Iterator[Dict]:
+        nonlocal req, resp, next_sync_token
+        while True:
+            yield from resp.get("items", [])
+            if resp.get("nextPageToken"):
+                req = cal.events().list_next(req, resp)
+                resp = req.execute()
+            else:
+                next_sync_token = resp.get("nextSyncToken")
+                return
+    
+    return events(), lambda: next_sync_token
+
+
+def list_changed_events(cal, calendar_id: str, sync_token: Optional[str]) -> Tuple[Optional[List[Dict]], Optional[str]]:
+    """
+    Fetch changed events from Calendar API using sync tokens.
+    Returns (events, next_sync_token) or (None, None) if sync token is invalid.
+    """
+    events, get_next_sync_token = iter_changed_events(cal, calendar_id, sync_token)
+    if events is None:
+        return None, None
+    return list(events), get_next_sync_token()
+
+
+def replace_cost_annotation(desc: str, cost_line: str) -> Optional[str]:
+    """
+    Replace every cost annotation in a description with cost_line.
+    An annotation runs from the cost tag to the end of its line, plus any
+    following "└─ Invited cost" lines. Returns None if desc has no annotation.
+    """
+    start = desc.find(_TAG_PREFIX)
+    if start < 0:
+        return None
+    parts = []
+    pos = 0
+    while start >= 0:
+        end = desc.find("\n", start)
+        while end >= 0 and desc.startswith(("└", "─"), end + 1):
+            end = desc.find("\n", end + 1)
+        if end < 0:
+            end = len(desc)
+        parts += [desc[pos:start], cost_line]
+        pos = end
+        start = desc.find(_TAG_PREFIX, end)
+    parts.append(desc[pos:])
+    return "".join(parts)
 
 
+@functools.lru_cache(maxsize=4096)
 def get_cost_display_format(cost: int) -> str:
-    """Format cost with color coding using emoji indicators."""
+    """
+    Format cost with color coding using emoji indicators.
+    Cached because costs (rate × attendees × duration) cluster on a few values.
+    """
     # Use emoji with single cost display for clean appearance
     if cost > 1000:
         # Red for high cost (>$1000)
@@ -98,8 +174,11 @@ def create_dual_cost_display(cost_info: Dict) -> str:
             f"({invited_count} invited → {effective_count} attending)")
 
 
-def annotate_event(cal: Any, calendar_id: str, event: Dict[str, Any], cost_info) -> None:
-    """Add cost annotation to calendar event description with invited vs effective costs."""
+def annotation_request(cal: Any, calendar_id: str, event: Dict[str, Any], cost_info) -> Optional[Any]:
+    """
+    Build (without executing) the patch request that annotates an event with its cost.
+    Returns None if the event already carries the same costs and annotation.
+    """
     event_id = event["id"]
     desc = event.get("description", "") or ""
     
@@ -108,18 +187,25 @@ def annotate_event(cal: Any, calendar_id: str, event: Dict[str, Any], cost_info)
         # Legacy single cost format
         cost_display = get_cost_display_format(cost_info)
         cost_line = f"{config.cost_tag}: {cost_display}"
-        extended_cost = str(cost_info)
+        effective_cost = invited_cost = str(cost_info)
     else:
         # New dual cost format
         cost_line = create_dual_cost_display(cost_info)
-        extended_cost = str(cost_info['effective_cost'])
+        effective_cost = str(cost_info['effective_cost'])
+        invited_cost = str(cost_info['invited_cost'])
     
-    # Check if already annotated (idempotent) - look for the tag pattern
-    tag_pattern = re.escape(config.cost_tag) + r":.*?(?=\n(?![└─])|$)"
-    if re.search(tag_pattern, desc, re.DOTALL):
-        # Replace existing cost annotation (including multi-line invited cost info)
-        new_desc = re.sub(tag_pattern, cost_line, desc, flags=re.DOTALL)
-    else:
+    # Replace existing cost annotation (including multi-line invited cost info) if present
+    new_desc = replace_cost_annotation(desc, cost_line)
+    
+    # Skip unchanged events: the listing already includes extendedProperties, and an
+    # unchanged description means the rendered annotation (with attendee counts) matches
+    existing = event.get("extendedProperties", {}).get("private", {})
+    if (existing.get("effectiveCost") == effective_cost
+            and existing.get("invitedCost") == invited_cost
+            and new_desc == desc):
+        return None
+    
+    if new_desc is None:
         # Add new cost line at the beginning for visibility
         if desc.strip():
             new_desc = f"{cost_line}\n\n{desc}"
@@ -127,31 +213,143 @@ def annotate_event(cal: Any, calendar_id: str, event: Dict[str, Any], cost_info)
             new_desc = cost_line
     
     # Update event with cost in description and extended properties
+    # (meetingCost mirrors effectiveCost for readers of the original single-cost format)
     patch_body = {
         "description": new_desc,
         "extendedProperties": {
             "private": {
-                "meetingCost": extended_cost,
-                "invitedCost": str(cost_info['invited_cost']) if isinstance(cost_info, dict) else extended_cost,
-                "effectiveCost": str(cost_info['effective_cost']) if isinstance(cost_info, dict) else extended_cost
+                "meetingCost": effective_cost,
+                "invitedCost": invited_cost,
+                "effectiveCost": effective_cost
             }
         }
     }
     
-    cal.events().patch(
+    return cal.events().patch(
         calendarId=calendar_id,
         eventId=event_id,
         body=patch_body,
         sendNotifications=False  # Don't spam attendees with updates
-    ).execute()
+    )
+
+
+def annotate_event(cal: Any, calendar_id: str, event: Dict[str, Any], cost_info) -> None:
+    """Add cost annotation to calendar event description with invited vs effective costs."""
+    request = annotation_request(cal, calendar_id, event, cost_info)
+    if request is not None:
+        request.execute()
+
+
+def annotate_events(cal: Any, calendar_id: str, annotations: Iterable[Tuple[Dict[str, Any], Any]]) -> Tuple[int, int]:
+    """
+    Annotate many events of one calendar using batch HTTP requests.
+    Takes (event, cost_info) pairs and returns (annotated, unchanged) event counts.
+    Failures are logged per event without stopping the remaining patches.
+    """
+    annotated = 0
+    unchanged = 0
+    event_ids = []
+
+    def on_patch_done(request_id: str, response: Any, exception: Optional[Exception]) -> None:
+        nonlocal annotated
+        if exception is not None:
+            print(f"Failed to annotate event {calendar_id}:{event_ids[int(request_id)]}: {exception}")
+        else:
+            annotated += 1
+
+    def flush() -> None:
+        if not event_ids:
+            return
+        try:
+            batch.execute()
+        except Exception as e:
+            print(f"Failed to annotate {len(event_ids)} events for {calendar_id}: {e}")
+        event_ids.clear()
+
+    batch = cal.new_batch_http_request(callback=on_patch_done)
+    for event, cost_info in annotations:
+        request = annotation_request(cal, calendar_id, event, cost_info)
+        if request is None:
+            unchanged += 1
+            continue
+        batch.add(request, request_id=str(len(event_ids)))
+        event_ids.append(event.get("id"))
+        if len(event_ids) >= BATCH_LIMIT:
+            flush()
+            batch = cal.new_batch_http_request(callback=on_patch_done)
+    flush()
+
+    return annotated, unchanged
 
 
 def save_sync_token(email: str, sync_token: str) -> None:
     """Save sync token for user in Firestore."""
-    user_doc(email).set({"syncToken": sync_token}, merge=True)
+    save_sync_tokens({email: sync_token})
+
+
+def save_sync_tokens(tokens: Dict[str, str]) -> None:
+    """Save sync tokens for many users in Firestore with a single commit."""
+    shards = {}
+    for email, sync_token in tokens.items():
+        shards.setdefault(user_doc(email), {})[email] = sync_token
+
+    # The update mask only touches these users' fields, keeping other tokens in the shard
+    writes = [
+        {
+            "update": {
+                "name": name,
+                "fields": {email: {"stringValue": sync_token} for email, sync_token in shard.items()}
+            },
+            "updateMask": {"fieldPaths": [_field_path(email) for email in shard]}
+        }
+        for name, shard in shards.items()
+    ]
+    resp = firestore_session.post(f"{_DOCUMENTS_URL}:commit", json={"writes": writes})
+    resp.raise_for_status()
 
 
 def get_sync_token(email: str) -> Optional[str]:
     """Get sync token for user from Firestore."""
-    doc = user_doc(email).get()
-    return doc.to_dict().get("syncToken") if doc.exists else None
\ No newline at end of file
+    return get_sync_tokens([email]).get(email)
+
+
+def get_sync_tokens(emails: List[str]) -> Dict[str, Optional[str]]:
+    """
+    Get sync tokens for many users from Firestore, reading each shard document once.
+    Users missing from the shards fall back to their legacy per-user document, so existing
+    tokens carry over; tokens found there are copied into the shards right away.
+    """
+    shard_names = sorted({user_doc(email) for email in emails})
+    if not shard_names:
+        return {}
+
+    resp = firestore_session.post(f"{_DOCUMENTS_URL}:batchGet", json={"documents": shard_names})
+    resp.raise_for_status()
+    stored = {}
+    for result in resp.json():
+        doc = result.get("found")
+        if doc:
+            stored.update(doc.get("fields", {}))
+
+    tokens = {email: stored[email].get("stringValue") for email in emails if email in stored}
+    legacy_tokens = _get_legacy_sync_tokens([email for email in emails if email not in tokens])
+    migrated = {email: token for email, token in legacy_tokens.items() if token}
+    if migrated:
+        # Copy now so the next run finds these users in the shards even if processing fails
+        save_sync_tokens(migrated)
+    tokens.update(legacy_tokens)
+    return tokens
+
+
+def _get_legacy_sync_tokens(emails: List[str]) -> Dict[str, Optional[str]]:
+    """Get sync tokens from legacy per-user documents, LEGACY_GET_CHUNK documents per batchGet."""
+    tokens = {}
+    for i in range(0, len(emails), LEGACY_GET_CHUNK):
+        names = {legacy_user_doc(email): email for email in emails[i:i + LEGACY_GET_CHUNK]}
+        resp = firestore_session.post(f"{_DOCUMENTS_URL}:batchGet", json={"documents": list(names)})
+        resp.raise_for_status()
+        for result in resp.json():
+            doc = result.get("found")
+            if doc and "syncToken" in doc.get("fields", {}):
+                tokens[names[doc["name"]]] = doc["fields"]["syncToken"].get("stringValue")
+    return tokens
\ No newline at end of file
@@ -1,7 +1,8 @@
 import os
 import json
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional
+from typing import List, Optional
 from dotenv import load_dotenv
 
 # Load .env file from project root
@@ -11,51 +12,64 @@ if env_path.exists():
     load_dotenv(env_path)
 
 
-class Config:
-    def __init__(self):
-        # Core configuration
-        self.domain = os.environ.get("DOMAIN", "hginsights.com")
-        self.default_rate = float(os.environ.get("DEFAULT_RATE", "125"))
-        self.cost_tag = os.environ.get("COST_TAG", "[[MEETING_COST]]")
-        self.internal_only = os.environ.get("INTERNAL_ONLY", "true").lower() == "true"
-        self.max_users = int(os.environ.get("MAX_USERS", "10000"))
-        self.window_days = int(os.environ.get("WINDOW_DAYS", "35"))
-        self.admin_subject = os.environ.get("ADMIN_SUBJECT")
-        
-        # Load Google credentials from file or environment variable (fallback)
-        self.google_credentials_json = self._load_google_credentials()
+def _load_google_credentials() -> dict:
+    """Load Google credentials from file path or environment variable."""
+    # Try to load from file first (preferred method)
+    creds_path = os.environ.get("GOOGLE_CREDENTIALS_PATH")
+    if creds_path:
+        creds_file = Path(creds_path)
+        if not creds_file.is_absolute():
+            # Resolve relative path from project root
+            creds_file = project_root / creds_path
         
-        self.scopes = [
-            "https://www.googleapis.com/auth/calendar",
-            "https://www.googleapis.com/auth/admin.directory.user.readonly"
-        ]
+        if creds_file.exists():
+            with open(creds_file, 'r') as f:
+                return json.load(f)
+        else:
+            raise FileNotFoundError(f"Google credentials file not found: {creds_file}")
     
-    def _load_google_credentials(self) -> dict:
-        """Load Google credentials from file path or environment variable."""
-        # Try to load from file first (preferred method)
-        creds_path = os.environ.get("GOOGLE_CREDENTIALS_PATH")
-        if creds_path:
-            creds_file = Path(creds_path)
-            if not creds_file.is_absolute():
-                # Resolve relative path from project root
-                creds_file = project_root / creds_path
-            
-            if creds_file.exists():
-                with open(creds_file, 'r') as f:
-                    return json.load(f)
-            else:
-                raise FileNotFoundError(f"Google credentials file not found: {creds_file}")
-        
-        # Fallback to environment variable (for backwards compatibility)
-        creds_json = os.environ.get("GOOGLE_CREDENTIALS_JSON")
-        if creds_json:
-            return json.loads(creds_json)
-        
-        raise ValueError(
-            "Google credentials not found. Set either:\n"
-            "  - GOOGLE_CREDENTIALS_PATH to point to your credentials.json file, or\n"
-            "  - GOOGLE_CREDENTIALS_JSON with the JSON content directly"
-        )
+    # Fallback to environment variable (for backwards compatibility)
+    creds_json = os.environ.get("GOOGLE_CREDENTIALS_JSON")
+    if creds_json:
+        return json.loads(creds_json)
+    
+    raise ValueError(
+        "Google credentials not found. Set either:\n"
+        "  - GOOGLE_CREDENTIALS_PATH to point to your credentials.json file, or\n"
+        "  - GOOGLE_CREDENTIALS_JSON with the JSON content directly"
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    # Core configuration
+    domain: str = field(default_factory=lambda: os.environ.get("DOMAIN", "hginsights.com"))
+    default_rate: float = field(default_factory=lambda: float(os.environ.get("DEFAULT_RATE", "125")))
+    cost_tag: str = field(default_factory=lambda: os.environ.get("COST_TAG", "[[MEETING_COST]]"))
+    internal_only: bool = field(default_factory=lambda: os.environ.get("INTERNAL_ONLY", "true").lower() == "true")
+    max_users: int = field(default_factory=lambda: int(os.environ.get("MAX_USERS", "10000")))
+    window_days: int = field(default_factory=lambda: int(os.environ.get("WINDOW_DAYS", "35")))
+    user_concurrency: int = field(default_factory=lambda: int(os.environ.get("USER_CONCURRENCY", "50")))
+    admin_subject: Optional[str] = field(default_factory=lambda: os.environ.get("ADMIN_SUBJECT"))
+    
+    # Load Google credentials from file or environment variable (fallback)
+    google_credentials_json: dict = field(default_factory=_load_google_credentials, repr=False)
+    
+    scopes: List[str] = field(default_factory=lambda: [
+        "https://www.googleapis.com/auth/calendar",
+        "https://www.googleapis.com/auth/admin.directory.user.readonly"
+    ])
+    
+    # Derived values precomputed for per-event hot paths
+    domain_suffix: str = field(init=False)
+    cost_tag_prefix: str = field(init=False)
+    default_rate_cents: int = field(init=False)
+    
+    def __post_init__(self):
+        # Frozen dataclass, so derived fields are set through object.__setattr__
+        object.__setattr__(self, "domain_suffix", f"@{self.domain}".lower())
+        object.__setattr__(self, "cost_tag_prefix", f"{self.cost_tag}:")
+        object.__setattr__(self, "default_rate_cents", round(self.default_rate * 100))
     
     @property
     def has_admin_subject(self) -> bool:
@@ -3,14 +3,23 @@ from datetime import datetime
 from typing import Dict, Any, List
 from config import config
 
+# Internal domain suffix; only this many trailing characters of an email need lowercasing
+_DOMAIN_SUFFIX = config.domain_suffix
+_DOMAIN_LEN = len(_DOMAIN_SUFFIX)
+
+# Responses counted towards effective cost: yes, maybe, or no response yet.
+# Google returns these exact spellings, so no per-attendee lowercasing is needed;
+# "needsaction" is kept for events built with the lowercase form.
+_EFFECTIVE_RESPONSES = frozenset(("accepted", "tentative", "needsAction", "needsaction"))
+
 
 def internal_email(email: str) -> bool:
     """Check if email belongs to internal domain."""
-    return email.lower().endswith(f"@{config.domain}")
+    return email[-_DOMAIN_LEN:].lower() == _DOMAIN_SUFFIX
 
 
-def event_duration_hours(event: Dict[str, Any]) -> float:
-    """Calculate event duration in hours."""
+def event_duration_seconds(event: Dict[str, Any]) -> int:
+    """Calculate event duration in whole seconds."""
     start = event.get("start", {})
     end = event.get("end", {})
     
@@ -19,13 +28,18 @@ def event_duration_hours(event: Dict[str, Any]) -> float:
     
     # Skip all-day events (date only)
     if not start_time or not end_time:
-        return 0.0
+        return 0
     
-    start_dt = datetime.fromisoformat(start_time.replace("Z", "+00:00"))
-    end_dt = datetime.fromisoformat(end_time.replace("Z", "+00:00"))
+    # Python 3.11+ parses RFC 3339 "Z" offsets natively, no string rewriting needed
+    start_dt = datetime.fromisoformat(start_time)
+    end_dt = datetime.fromisoformat(end_time)
     
-    duration_seconds = max(0.0, (end_dt - start_dt).total_seconds())
-    return duration_seconds / 3600.0
+    return max(0, int((end_dt - start_dt).total_seconds()))
+
+
+def event_duration_hours(event: Dict[str, Any]) -> float:
+    """Calculate event duration in hours."""
+    return event_duration_seconds(event) / 3600.0
 
 
 def compute_meeting_cost(event: Dict[str, Any], hourly_rate: float = None) -> Dict[str, int]:
@@ -34,58 +48,65 @@ def compute_meeting_cost(event: Dict[str, Any], hourly_rate: float = None) -> Di
     Returns dict with 'invited_cost', 'effective_cost', and status info.
     Returns {'invited_cost': -1, 'effective_cost': -1} if event should be skipped.
     """
+    # Costs are computed in integer cents and rounded half up to whole dollars
     if hourly_rate is None:
-        hourly_rate = config.default_rate
-    
-    attendees = [a for a in event.get("attendees", []) if a.get("email")]
+        rate_cents = config.default_rate_cents
+    else:
+        rate_cents = round(hourly_rate * 100)
     
     # Skip if no valid duration
-    hours = event_duration_hours(event)
-    if hours <= 0:
+    seconds = event_duration_seconds(event)
+    if seconds <= 0:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'no_duration'}
     
-    # Filter to internal attendees only
-    internal_attendees = [a for a in attendees if internal_email(a["email"])]
+    # Count attendees in a single pass: everyone with an email, internal attendees,
+    # and internal attendees who responded "yes" or "maybe" (or haven't responded yet)
+    attendee_count = 0
+    invited_count = 0
+    effective_count = 0
+    for attendee in event.get("attendees", ()):
+        email = attendee.get("email")
+        if not email:
+            continue
+        attendee_count += 1
+        if email[-_DOMAIN_LEN:].lower() != _DOMAIN_SUFFIX:
+            continue
+        invited_count += 1
+        if attendee.get("responseStatus", "needsAction") in _EFFECTIVE_RESPONSES:
+            effective_count += 1
     
     # Skip mixed internal/external meetings if configured
-    if config.internal_only and len(internal_attendees) != len(attendees):
+    if config.internal_only and invited_count != attendee_count:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'mixed_meeting'}
     
     # Skip if no internal attendees
-    if len(internal_attendees) == 0:
+    if invited_count == 0:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'no_internal_attendees'}
     
     # NEW: Skip meetings with only 1 attendee (solo meetings)
-    if len(internal_attendees) == 1:
+    if invited_count == 1:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'solo_meeting'}
     
     # Calculate invited cost (all internal attendees regardless of response)
-    invited_cost = int(round(hours * len(internal_attendees) * hourly_rate, 0))
-    
-    # Calculate effective cost based on responses
-    # Count attendees who responded "yes" or "maybe" (or haven't responded yet)
-    effective_attendees = []
-    for attendee in internal_attendees:
-        response = attendee.get("responseStatus", "needsAction").lower()
-        if response in ["accepted", "tentative", "needsaction"]:  # yes, maybe, or no response
-            effective_attendees.append(attendee)
+    # seconds × people × cents/hour ÷ (3600 s/hour × 100 cents/dollar), rounded half up to whole dollars
+    invited_cost = (seconds * invited_count * rate_cents + 180000) // 360000
     
     # If everyone declined, skip the meeting
-    if len(effective_attendees) == 0:
+    if effective_count == 0:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'all_declined'}
     
     # NEW: Skip if effective attendees is only 1 person
-    if len(effective_attendees) == 1:
+    if effective_count == 1:
         return {'invited_cost': -1, 'effective_cost': -1, 'skip_reason': 'effective_solo_meeting'}
     
-    effective_cost = int(round(hours * len(effective_attendees) * hourly_rate, 0))
+    effective_cost = (seconds * effective_count * rate_cents + 180000) // 360000
     
     return {
         'invited_cost': invited_cost,
         'effective_cost': effective_cost,
-        'invited_count': len(internal_attendees),
-        'effective_count': len(effective_attendees),
-        'hours': hours,
+        'invited_count': invited_count,
+        'effective_count': effective_count,
+        'hours': seconds / 3600.0,
         'skip_reason': None
     }
 
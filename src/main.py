@@ -1,50 +1,99 @@
 import time
-from typing import Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Tuple, Dict, Any, List, Optional
 from flask import Flask
 from auth import calendar_service
-from calendar_service import list_changed_events, annotate_event, get_sync_token, save_sync_token
+from calendar_service import iter_changed_events, annotate_events, get_sync_tokens, save_sync_tokens
+from config import config
 from cost_calculator import compute_meeting_cost
 from user_service import list_active_users
 
 app = Flask(__name__)
 
+# Collected sync tokens are saved every TOKEN_FLUSH_USERS users or TOKEN_FLUSH_SECONDS,
+# so a run cut short by the request timeout keeps the progress it made
+TOKEN_FLUSH_USERS = 500
+TOKEN_FLUSH_SECONDS = 30
 
-@app.get("/cron")
-def cron() -> Tuple[Dict[str, Any], int]:
-    """Main cron endpoint that processes all users' calendar events."""
-    users = list_active_users()
-    processed = 0
-    skipped = 0
 
-    for idx, email in enumerate(users):
-        # Small yield to avoid hammering APIs
-        if idx % 20 == 0:
-            time.sleep(0.1)
+def _process_user(email: str, sync_token: Optional[str]) -> Tuple[int, int, int, Optional[str]]:
+    """
+    Annotate events changed since sync_token for a single user.
+    Returns (processed, unchanged, skipped) event counts and the user's next sync token.
+    """
+    skipped = 0
 
-        cal = calendar_service(email)
-        sync_token = get_sync_token(email)
+    cal = calendar_service(email)
 
-        # Fetch changes using sync tokens
-        items, next_token = list_changed_events(cal, email, sync_token)
-        # If token invalid, do a full resync
-        if items is None and next_token is None:
-            items, next_token = list_changed_events(cal, email, None)
+    # Stream changes using sync tokens
+    events, get_next_token = iter_changed_events(cal, email, sync_token)
+    # If token invalid, do a full resync
+    if events is None:
+        events, get_next_token = iter_changed_events(cal, email, None)
 
-        for event in items:
+    def annotations():
+        nonlocal skipped
+        for event in events:
             cost_info = compute_meeting_cost(event)
             if cost_info['effective_cost'] < 0:
                 skipped += 1
                 continue
-            
+            yield event, cost_info
+
+    # Patch events in batches as pages arrive, without waiting for the full listing;
+    # failures are logged per event and don't stop the rest
+    processed, unchanged = annotate_events(cal, email, annotations())
+
+    return processed, unchanged, skipped, get_next_token()
+
+
+def _process_users(users: List[str]) -> Tuple[int, int, int]:
+    """
+    Process users on a thread pool of config.user_concurrency workers.
+    Google API calls are blocking I/O and release the GIL while waiting on the network.
+    Each user is handled by a single worker with its own Calendar service, so
+    per-user request rates stay within Google's quota.
+    Sync tokens are read for all users up front and saved in batches as users finish.
+    Returns total (processed, unchanged, skipped) event counts.
+    """
+    processed = 0
+    unchanged = 0
+    skipped = 0
+    stored_tokens = get_sync_tokens(users)
+    sync_tokens = {}
+    last_flush = time.monotonic()
+
+    with ThreadPoolExecutor(max_workers=config.user_concurrency) as pool:
+        futures = {pool.submit(_process_user, email, stored_tokens.get(email)): email for email in users}
+        for future in as_completed(futures):
             try:
-                annotate_event(cal, email, event, cost_info)
-                processed += 1
+                user_processed, user_unchanged, user_skipped, next_token = future.result()
             except Exception as e:
-                # Log error but continue processing other events
-                print(f"Failed to annotate event {email}:{event.get('id')}: {e}")
+                # Log error but continue processing other users
+                print(f"Failed to process user {futures[future]}: {e}")
+                continue
+            processed += user_processed
+            unchanged += user_unchanged
+            skipped += user_skipped
+            if next_token:
+                sync_tokens[futures[future]] = next_token
+
+            # Save sync tokens collected so far
+            if len(sync_tokens) >= TOKEN_FLUSH_USERS or (sync_tokens and time.monotonic() - last_flush >= TOKEN_FLUSH_SECONDS):
+                save_sync_tokens(sync_tokens)
+                sync_tokens = {}
+                last_flush = time.monotonic()
+
+    # Save the remaining sync tokens for next run
+    if sync_tokens:
+        save_sync_tokens(sync_tokens)
 
-        # Save sync token for next run
-        if next_token:
-            save_sync_token(email, next_token)
+    return processed, unchanged, skipped
 
-    return {"processed": processed, "skipped": skipped}, 200
+
+@app.get("/cron")
+def cron() -> Tuple[Dict[str, Any], int]:
+    """Main cron endpoint that processes all users' calendar events."""
+    users = list_active_users()
+    processed, unchanged, skipped = _process_users(users)
+    return {"processed": processed, "unchanged": unchanged, "skipped": skipped}, 200
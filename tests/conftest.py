@@ -0,0 +1,48 @@
+"""
+Shared pytest configuration for the test suite.
+Integration tests talk to a real Google Calendar and only run with --integration.
+"""
+import os
+from pathlib import Path
+
+import pytest
+from dotenv import load_dotenv
+
+# Load .env file for configuration (src/ is put on the import path by pytest.ini)
+env_path = Path(__file__).resolve().parent.parent / '.env'
+if env_path.exists():
+    load_dotenv(env_path)
+
+
+def pytest_addoption(parser):
+    parser.addoption("--integration", action="store_true", default=False,
+                     help="run integration tests against a real calendar (modifies events)")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: test uses the real Google Calendar API")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--integration"):
+        return
+    skip_integration = pytest.mark.skip(reason="needs --integration")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip_integration)
+
+
+@pytest.fixture(scope="session")
+def test_user_email():
+    """Calendar user the integration tests run against."""
+    email = os.environ.get('TEST_USER_EMAIL')
+    if not email:
+        pytest.skip("TEST_USER_EMAIL environment variable is required")
+    return email
+
+
+@pytest.fixture(scope="session")
+def cal(test_user_email):
+    """Authenticated calendar service shared by every integration test in the session."""
+    from auth import calendar_service
+    return calendar_service(test_user_email)
\ No newline at end of file
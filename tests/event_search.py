@@ -0,0 +1,82 @@
+"""
+Shared calendar search used by the integration tests.
+Walks back through a real calendar looking for meetings to test with.
+"""
+from datetime import datetime, timezone, timedelta
+
+from config import config
+
+# Calendar history searched, most recent first
+SEARCH_DAYS = 365
+
+# History is listed in windows going backwards from now; each window is fully paged
+SEARCH_WINDOW_DAYS = 30
+
+# Events per page (the Calendar API allows up to 2500)
+PAGE_SIZE = 250
+
+# Listing only returns what the attendee filter needs (plus `summary` for skip messages);
+# matching events are re-fetched in full with get_full_event()
+LIST_FIELDS_MIN = "items(id,summary,start/dateTime,attendees/email),nextPageToken"
+GET_FIELDS_FULL = "id,summary,start,end,attendees,organizer,description,extendedProperties,etag"
+
+DOMAIN_SUFFIX = f"@{config.domain}"
+
+
+def iter_recent_events(cal, calendar_id):
+    """
+    Yield events from the past SEARCH_DAYS, most recent first.
+    Events only carry LIST_FIELDS_MIN; use get_full_event() for the ones you keep.
+    The API only sorts by ascending start time, so history is listed in
+    SEARCH_WINDOW_DAYS windows going backwards, each followed with nextPageToken
+    and handed out newest first. The next window is only fetched if the caller
+    keeps iterating.
+    """
+    now = datetime.now(timezone.utc)
+    events = cal.events()
+    seen_ids = set()
+    
+    for days_back in range(0, SEARCH_DAYS, SEARCH_WINDOW_DAYS):
+        time_max = now - timedelta(days=days_back)
+        time_min = now - timedelta(days=min(days_back + SEARCH_WINDOW_DAYS, SEARCH_DAYS))
+        print(f"  📅 Checking events from {time_min.strftime('%Y-%m-%d')} to {time_max.strftime('%Y-%m-%d')}")
+        
+        window = []
+        request = events.list(
+            calendarId=calendar_id,
+            timeMin=time_min.isoformat(),
+            timeMax=time_max.isoformat(),
+            maxResults=PAGE_SIZE,
+            singleEvents=True,
+            orderBy='startTime',
+            eventTypes=['default'],  # Skip out-of-office, focus time and working location entries
+            fields=LIST_FIELDS_MIN
+        )
+        while request is not None:
+            response = request.execute()
+            window.extend(response.get('items', []))
+            request = events.list_next(request, response)
+        print(f"  📊 Found {len(window)} events in this period")
+        
+        for event in reversed(window):
+            # Events spanning a window boundary are listed by both windows
+            if event['id'] not in seen_ids:
+                seen_ids.add(event['id'])
+                yield event
+
+
+def get_full_event(cal, calendar_id, event_id):
+    """Fetch the complete event needed for cost calculation and annotation."""
+    return cal.events().get(
+        calendarId=calendar_id,
+        eventId=event_id,
+        fields=GET_FIELDS_FULL
+    ).execute()
+
+
+def is_internal_group_meeting(event):
+    """True for timed events with at least two attendees, all from the configured domain."""
+    if 'dateTime' not in event.get('start', {}):
+        return False
+    attendees = event.get('attendees', ())
+    return len(attendees) >= 2 and all(a.get('email', '').endswith(DOMAIN_SUFFIX) for a in attendees)
\ No newline at end of file
@@ -0,0 +1,23 @@
+"""
+Environment setup for running the test files directly as scripts.
+Under pytest, pytest.ini puts src/ on the import path, conftest.py loads .env,
+and pytest's own options (e.g. --log-cli-level) control logging.
+"""
+import logging
+import os
+import sys
+from pathlib import Path
+from dotenv import load_dotenv
+
+project_root = Path(__file__).resolve().parent.parent
+
+# Add src directory to path to import our modules
+sys.path.insert(0, str(project_root / 'src'))
+
+# Load .env file for configuration
+env_path = project_root / '.env'
+if env_path.exists():
+    load_dotenv(env_path)
+
+# Per-event progress is logged at DEBUG; set LOG_LEVEL=DEBUG to see it
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'WARNING').upper(), format='%(message)s')
\ No newline at end of file
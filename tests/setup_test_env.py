@@ -128,8 +128,9 @@ def check_python_dependencies():
         'google-auth',
         'google-auth-httplib2', 
         'google-api-python-client',
-        'google-cloud-firestore',
-        'python-dotenv'
+        'requests',
+        'python-dotenv',
+        'pytest'
     ]
     
     missing_packages = []
@@ -143,10 +144,12 @@ def check_python_dependencies():
                 import google.auth.transport.requests
             elif package == 'google-api-python-client':
                 import googleapiclient.discovery
-            elif package == 'google-cloud-firestore':
-                import google.cloud.firestore
+            elif package == 'requests':
+                import requests
             elif package == 'python-dotenv':
                 import dotenv
+            elif package == 'pytest':
+                import pytest
             
             print(f"  ✅ {package}: Available")
             
@@ -191,7 +194,7 @@ def print_test_instructions():
     print()
     print("1. Unit Test (No API access needed):")
     print("   cd tests/")
-    print("   python3 test_cost_calculation.py")
+    print("   pytest test_cost_calculation.py")
     print()
     print("2. Integration Test - Cost Calculation Only:")
     print("   cd tests/")
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Unit tests for event annotation in calendar_service.
+Uses a fake Calendar client that records batch requests, so no API access is needed.
+"""
+import re
+import sys
+import pytest
+
+if __name__ == "__main__":
+    import script_env  # noqa: F401  (src/ import path and .env when run as a script)
+
+from config import config
+import calendar_service
+from calendar_service import annotate_events, annotation_request, replace_cost_annotation
+
+
+class FakePatch:
+    """Unexecuted events().patch request."""
+
+    def __init__(self, event_id, body):
+        self.event_id = event_id
+        self.body = body
+
+
+class FakeBatch:
+    """BatchHttpRequest stand-in that answers each request through the callback."""
+
+    def __init__(self, cal, callback):
+        self.cal = cal
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        self.cal.executed.append([request.event_id for _, request in self.requests])
+        if len(self.cal.executed) in self.cal.failing_batches:
+            raise RuntimeError("batch failed")
+        for request_id, request in self.requests:
+            exception = self.cal.failing_events.get(request.event_id)
+            self.callback(request_id, None if exception else request.body, exception)
+
+
+class FakeCalendar:
+    """Calendar client stand-in; failing_batches holds 1-based batch numbers whose execute() raises."""
+
+    def __init__(self, failing_events=None, failing_batches=()):
+        self.failing_events = failing_events or {}
+        self.failing_batches = set(failing_batches)
+        self.executed = []
+
+    def events(self):
+        return self
+
+    def patch(self, calendarId, eventId, body, sendNotifications):
+        return FakePatch(eventId, body)
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+def make_events(count):
+    return [({"id": f"e{i}"}, 100) for i in range(count)]
+
+
+def test_annotate_events_flushes_at_batch_limit():
+    limit = calendar_service.BATCH_LIMIT
+    cal = FakeCalendar()
+
+    assert annotate_events(cal, "primary", make_events(2 * limit + 1)) == (2 * limit + 1, 0)
+    assert [len(batch) for batch in cal.executed] == [limit, limit, 1]
+
+
+def test_annotate_events_counts_unchanged_events():
+    cal = FakeCalendar()
+    annotated = {
+        "id": "done",
+        "description": f"{config.cost_tag}: {calendar_service.get_cost_display_format(100)}\n\nAgenda",
+        "extendedProperties": {"private": {"invitedCost": "100", "effectiveCost": "100"}},
+    }
+
+    assert annotate_events(cal, "primary", [(annotated, 100), *make_events(2)]) == (2, 1)
+    assert cal.executed == [["e0", "e1"]]
+
+
+def test_annotate_events_reports_failures_by_event_id(monkeypatch, capsys):
+    monkeypatch.setattr(calendar_service, "BATCH_LIMIT", 3)
+    cal = FakeCalendar(failing_events={"e4": RuntimeError("forbidden")})
+
+    assert annotate_events(cal, "primary", make_events(6)) == (5, 0)
+    # request ids restart in every batch and must map back to that batch's events
+    assert "Failed to annotate event primary:e4: forbidden" in capsys.readouterr().out
+
+
+def test_annotate_events_continues_after_batch_error(monkeypatch, capsys):
+    monkeypatch.setattr(calendar_service, "BATCH_LIMIT", 2)
+    cal = FakeCalendar(failing_batches={1})
+
+    assert annotate_events(cal, "primary", make_events(5)) == (3, 0)
+    assert cal.executed == [["e0", "e1"], ["e2", "e3"], ["e4"]]
+    assert "Failed to annotate 2 events for primary: batch failed" in capsys.readouterr().out
+
+
+def regex_replace_cost_annotation(desc, cost_line):
+    """The original regex implementation replace_cost_annotation must match."""
+    tag_pattern = re.escape(config.cost_tag) + r":.*?(?=\n(?![└─])|$)"
+    if re.search(tag_pattern, desc, re.DOTALL):
+        return re.sub(tag_pattern, cost_line, desc, flags=re.DOTALL)
+    return None
+
+
+TAG = config.cost_tag
+NEW_LINE = f"{TAG}: 🟢 $300"
+
+
+@pytest.mark.parametrize("desc", [
+    pytest.param("", id="empty"),
+    pytest.param("Agenda\n- item", id="no tag"),
+    pytest.param(f"{TAG}: 🟢 $200", id="tag only"),
+    pytest.param(f"Agenda\n\n{TAG}: 🟢 $200", id="tag at end without newline"),
+    pytest.param(f"{TAG}: 🟢 $200\n\nAgenda", id="tag before body"),
+    pytest.param(f"{TAG}: 🟢 $200\n", id="trailing newline"),
+    pytest.param(f"{TAG}: 🟢 $200\n└─ Invited cost: 🟢 $400 (4 invited → 2 attending)\n\nAgenda",
+                 id="continuation line"),
+    pytest.param(f"{TAG}: 🟢 $200\n└─ Invited cost: 🟢 $400 (4 invited → 2 attending)",
+                 id="continuation line at end"),
+    pytest.param(f"{TAG}: 🟢 $200\n└─ Invited cost: 🟢 $400\n─ more\nAgenda", id="several continuation lines"),
+    pytest.param(f"{TAG}: 🟢 $200\n\nAgenda\n\n{TAG}: 🟢 $100\n└─ Invited cost: 🟢 $400\nNotes",
+                 id="two annotations"),
+    pytest.param(f"{TAG}: 🟢 $200\n{TAG}: 🟢 $100\n", id="adjacent annotations"),
+])
+def test_replace_cost_annotation_matches_regex(desc):
+    assert replace_cost_annotation(desc, NEW_LINE) == regex_replace_cost_annotation(desc, NEW_LINE)
+
+
+
+DUAL_COST = {"invited_cost": 400, "effective_cost": 200, "invited_count": 4, "effective_count": 2}
+DUAL_COST_PROPERTIES = {"private": {"meetingCost": "200", "invitedCost": "400", "effectiveCost": "200"}}
+
+
+def test_annotation_request_skips_unchanged_event():
+    event = {
+        "id": "e1",
+        "description": f"{calendar_service.create_dual_cost_display(DUAL_COST)}\n\nAgenda",
+        "extendedProperties": DUAL_COST_PROPERTIES,
+    }
+    assert annotation_request(FakeCalendar(), "primary", event, DUAL_COST) is None
+
+
+def test_annotation_request_patches_missing_tag():
+    event = {"id": "e1", "description": "Agenda", "extendedProperties": DUAL_COST_PROPERTIES}
+
+    request = annotation_request(FakeCalendar(), "primary", event, DUAL_COST)
+    assert request.event_id == "e1"
+    assert request.body == {
+        "description": f"{calendar_service.create_dual_cost_display(DUAL_COST)}\n\nAgenda",
+        "extendedProperties": DUAL_COST_PROPERTIES,
+    }
+
+
+def test_annotation_request_patches_stale_counts():
+    # Same costs, but the description still shows the previous attendee counts
+    stale = dict(DUAL_COST, invited_count=5, effective_count=3)
+    event = {
+        "id": "e1",
+        "description": f"{calendar_service.create_dual_cost_display(stale)}\n\nAgenda",
+        "extendedProperties": DUAL_COST_PROPERTIES,
+    }
+
+    request = annotation_request(FakeCalendar(), "primary", event, DUAL_COST)
+    assert request.body["description"] == f"{calendar_service.create_dual_cost_display(DUAL_COST)}\n\nAgenda"
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v", *sys.argv[1:]]))
\ No newline at end of file
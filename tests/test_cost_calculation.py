@@ -4,36 +4,29 @@ Unit tests for meeting cost calculation logic.
 Tests the compute_meeting_cost function with various event scenarios.
 """
 import sys
-import os
+import pytest
 from datetime import datetime, timezone, timedelta
 
-# Add src directory to path to import our modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+if __name__ == "__main__":
+    import script_env  # noqa: F401  (src/ import path and .env when run as a script)
 
-# Load .env file for configuration
-from pathlib import Path
-from dotenv import load_dotenv
+from config import config
+from cost_calculator import compute_meeting_cost, internal_email, event_duration_hours
 
-project_root = Path(__file__).parent.parent
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
 
-from cost_calculator import compute_meeting_cost, internal_email, event_duration_hours
+# Fixed start time so test events are deterministic and built without clock reads
+BASE_START = datetime(2024, 1, 1, 9, 0, tzinfo=timezone.utc)
+BASE_START_ISO = BASE_START.isoformat()
+BASE_END_ISO = (BASE_START + timedelta(hours=1)).isoformat()
 
 
-def create_test_event(attendees, start_time=None, end_time=None, title="Test Meeting"):
-    """Create a test calendar event with specified attendees and times."""
-    if start_time is None:
-        start_time = datetime.now(timezone.utc)
-    if end_time is None:
-        end_time = start_time + timedelta(hours=1)
-    
+def create_test_event(attendees, start_iso=BASE_START_ISO, end_iso=BASE_END_ISO, title="Test Meeting"):
+    """Create a test calendar event with specified attendees and ISO start/end times."""
     return {
         "id": "test_event_123",
         "summary": title,
-        "start": {"dateTime": start_time.isoformat()},
-        "end": {"dateTime": end_time.isoformat()},
+        "start": {"dateTime": start_iso},
+        "end": {"dateTime": end_iso},
         "attendees": [{"email": email} for email in attendees],
         "organizer": {"email": attendees[0] if attendees else "organizer@example.com"}
     }
@@ -50,148 +43,132 @@ def create_allday_event(attendees):
     }
 
 
-def test_cost_calculation():
-    """Run cost calculation unit tests."""
-    print("🧪 Testing Meeting Cost Calculation Logic\n")
-    
-    # Test configuration
-    domain = os.environ.get("DOMAIN", "example.com")
-    default_rate = float(os.environ.get("DEFAULT_RATE", "125"))
-    
-    print(f"Domain: {domain}")
-    print(f"Default rate: ${default_rate}/hour")
-    print(f"Internal only mode: {os.environ.get('INTERNAL_ONLY', 'true')}")
-    print()
-    
-    test_cases = [
-        {
-            "name": "Internal-only meeting (2 attendees, 1 hour)",
-            "attendees": [f"alice@{domain}", f"bob@{domain}"],
-            "duration_hours": 1,
-            "expected": int(2 * default_rate * 1)  # 2 people * rate * 1 hour
-        },
-        {
-            "name": "Single person meeting (should be skipped - solo meetings excluded)", 
-            "attendees": [f"alice@{domain}"],
-            "duration_hours": 1,
-            "expected": -1  # Solo meetings are now skipped
-        },
-        {
-            "name": "Long meeting (3 attendees, 2.5 hours)",
-            "attendees": [f"alice@{domain}", f"bob@{domain}", f"charlie@{domain}"],
-            "duration_hours": 2.5,
-            "expected": int(3 * default_rate * 2.5)  # 3 people * rate * 2.5 hours
-        },
-        {
-            "name": "Mixed internal/external (should be skipped if INTERNAL_ONLY=true)",
-            "attendees": [f"alice@{domain}", "external@otherdomain.com"],
-            "duration_hours": 1,
-            "expected": -1  # Should be skipped when INTERNAL_ONLY=true
-        },
-        {
-            "name": "External-only meeting (should be skipped)",
-            "attendees": ["external1@otherdomain.com", "external2@otherdomain.com"],
-            "duration_hours": 1,
-            "expected": -1  # Should be skipped (no internal attendees)
-        },
-        {
-            "name": "No attendees (should be skipped)",
-            "attendees": [],
-            "duration_hours": 1,
-            "expected": -1  # Should be skipped (no attendees)
-        }
+DOMAIN = config.domain
+DEFAULT_RATE = config.default_rate
+
+# (attendees, duration_hours, expected effective cost), one pytest case per entry
+TEST_CASES = [
+    pytest.param(
+        [f"alice@{DOMAIN}", f"bob@{DOMAIN}"], 1,
+        int(2 * DEFAULT_RATE * 1),  # 2 people * rate * 1 hour
+        id="Internal-only meeting (2 attendees, 1 hour)"
+    ),
+    pytest.param(
+        [f"alice@{DOMAIN}"], 1,
+        -1,  # Solo meetings are now skipped
+        id="Single person meeting (should be skipped - solo meetings excluded)"
+    ),
+    pytest.param(
+        [f"alice@{DOMAIN}", f"bob@{DOMAIN}", f"charlie@{DOMAIN}"], 2.5,
+        int(3 * DEFAULT_RATE * 2.5 + 0.5),  # 3 people * rate * 2.5 hours, rounded half up
+        id="Long meeting (3 attendees, 2.5 hours)"
+    ),
+    pytest.param(
+        [f"alice@{DOMAIN}", "external@otherdomain.com"], 1,
+        -1,  # Should be skipped when INTERNAL_ONLY=true
+        id="Mixed internal/external (should be skipped if INTERNAL_ONLY=true)"
+    ),
+    pytest.param(
+        ["external1@otherdomain.com", "external2@otherdomain.com"], 1,
+        -1,  # Should be skipped (no internal attendees)
+        id="External-only meeting (should be skipped)"
+    ),
+    pytest.param(
+        [], 1,
+        -1,  # Should be skipped (no attendees)
+        id="No attendees (should be skipped)"
+    ),
+]
+
+
+@pytest.fixture
+def event(attendees, duration_hours):
+    """Test event for the parametrized case, built outside the benchmarked call."""
+    end_iso = (BASE_START + timedelta(hours=duration_hours)).isoformat()
+    return create_test_event(attendees, BASE_START_ISO, end_iso)
+
+
+@pytest.mark.parametrize("attendees, duration_hours, expected", TEST_CASES)
+def test_cost_case(benchmark, event, expected):
+    """Cost of a timed event matches the expected value (or -1 when skipped)."""
+    assert benchmark(compute_meeting_cost, event)['effective_cost'] == expected
+
+
+def test_custom_hourly_rate():
+    """An explicit hourly_rate is used instead of the default, rounded half up to whole dollars."""
+    end_iso = (BASE_START + timedelta(hours=1.5)).isoformat()
+    event = create_test_event([f"alice@{DOMAIN}", f"bob@{DOMAIN}", f"charlie@{DOMAIN}"], BASE_START_ISO, end_iso)
+    
+    # 3 people × 1.5 h × $99.99 = $449.955
+    result = compute_meeting_cost(event, hourly_rate=99.99)
+    assert result['invited_cost'] == 450
+    assert result['effective_cost'] == 450
+
+
+@pytest.mark.parametrize("hourly_rate, expected", [
+    (0.25, 1),   # $0.50, round() would give $0
+    (1.25, 3),   # $2.50, round() would give $2
+    (1.75, 4),   # $3.50
+])
+def test_half_dollar_rounds_up(hourly_rate, expected):
+    """Exact half-dollar costs round up rather than to even."""
+    event = create_test_event([f"alice@{DOMAIN}", f"bob@{DOMAIN}"])
+    
+    # 2 people × 1 h × hourly_rate
+    result = compute_meeting_cost(event, hourly_rate=hourly_rate)
+    assert result['invited_cost'] == expected
+    assert result['effective_cost'] == expected
+
+
+def test_declined_attendees():
+    """Declined attendees count towards the invited cost only."""
+    event = create_test_event([], BASE_START_ISO, BASE_END_ISO)
+    event["attendees"] = [
+        {"email": f"alice@{DOMAIN}", "responseStatus": "accepted"},
+        {"email": f"bob@{DOMAIN}", "responseStatus": "tentative"},
+        {"email": f"charlie@{DOMAIN}", "responseStatus": "needsAction"},
+        {"email": f"dana@{DOMAIN}", "responseStatus": "declined"},
     ]
     
-    # Run test cases
-    passed = 0
-    failed = 0
-    
-    for test_case in test_cases:
-        print(f"📋 Testing: {test_case['name']}")
-        
-        # Create event with specified duration
-        start_time = datetime.now(timezone.utc)
-        end_time = start_time + timedelta(hours=test_case['duration_hours'])
-        event = create_test_event(test_case['attendees'], start_time, end_time)
-        
-        # Calculate cost using new format
-        cost_result = compute_meeting_cost(event)
-        actual_cost = cost_result['effective_cost']
-        expected_cost = test_case['expected']
-        
-        # Check result
-        if actual_cost == expected_cost:
-            print(f"  ✅ Expected: {expected_cost}, Got: {actual_cost}")
-            if 'skip_reason' in cost_result and cost_result['skip_reason']:
-                print(f"    (Skipped: {cost_result['skip_reason']})")
-            passed += 1
-        else:
-            print(f"  ❌ Expected: {expected_cost}, Got: {actual_cost}")
-            if 'skip_reason' in cost_result and cost_result['skip_reason']:
-                print(f"    (Skipped: {cost_result['skip_reason']})")
-            failed += 1
-        
-        print()
-    
-    # Test all-day event
-    print("📋 Testing: All-day event (should be skipped)")
-    allday_event = create_allday_event([f"alice@{domain}", f"bob@{domain}"])
-    allday_result = compute_meeting_cost(allday_event)
-    if allday_result['effective_cost'] == -1:
-        print(f"  ✅ All-day event correctly skipped ({allday_result['skip_reason']})")
-        passed += 1
-    else:
-        print(f"  ❌ All-day event should be skipped, got: {allday_result['effective_cost']}")
-        failed += 1
-    
-    print()
-    
-    # Test helper functions
-    print("🔧 Testing Helper Functions:")
-    
-    # Test internal_email function
-    internal_test = internal_email(f"test@{domain}")
-    external_test = internal_email("test@external.com")
-    
-    if internal_test and not external_test:
-        print("  ✅ internal_email() function working correctly")
-        passed += 1
-    else:
-        print(f"  ❌ internal_email() failed: internal={internal_test}, external={external_test}")
-        failed += 1
-    
-    # Test duration calculation
-    start = datetime(2023, 12, 1, 10, 0, tzinfo=timezone.utc)
-    end = datetime(2023, 12, 1, 11, 30, tzinfo=timezone.utc)
-    test_event = create_test_event([f"test@{domain}"], start, end)
-    duration = event_duration_hours(test_event)
-    
-    if duration == 1.5:
-        print("  ✅ event_duration_hours() function working correctly")
-        passed += 1
-    else:
-        print(f"  ❌ event_duration_hours() failed: expected 1.5, got {duration}")
-        failed += 1
-    
-    print()
-    
-    # Summary
-    total_tests = passed + failed
-    print(f"📊 Test Results: {passed}/{total_tests} passed")
+    result = compute_meeting_cost(event, hourly_rate=100)
+    assert result['invited_count'] == 4
+    assert result['effective_count'] == 3
+    assert result['invited_cost'] == 400
+    assert result['effective_cost'] == 300
+
+
+def test_all_declined_skipped():
+    """Meetings everyone declined are skipped."""
+    event = create_test_event([], BASE_START_ISO, BASE_END_ISO)
+    event["attendees"] = [
+        {"email": f"alice@{DOMAIN}", "responseStatus": "declined"},
+        {"email": f"bob@{DOMAIN}", "responseStatus": "declined"},
+    ]
     
-    if failed == 0:
-        print("🎉 All tests passed!")
-        return True
-    else:
-        print(f"💥 {failed} test(s) failed")
-        return False
+    result = compute_meeting_cost(event)
+    assert result['effective_cost'] == -1
+    assert result['skip_reason'] == 'all_declined'
+
+
+def test_allday_event_skipped():
+    """All-day events have no duration and are skipped."""
+    allday_result = compute_meeting_cost(create_allday_event([f"alice@{DOMAIN}", f"bob@{DOMAIN}"]))
+    assert allday_result['effective_cost'] == -1
+    assert allday_result['skip_reason'] == 'no_duration'
+
+
+def test_internal_email():
+    """internal_email() accepts the configured domain only."""
+    assert internal_email(f"test@{DOMAIN}")
+    assert not internal_email("test@external.com")
+
+
+def test_event_duration_hours():
+    """event_duration_hours() reads the duration from event timestamps."""
+    end_iso = (BASE_START + timedelta(hours=1.5)).isoformat()
+    test_event = create_test_event([f"test@{DOMAIN}"], BASE_START_ISO, end_iso)
+    assert event_duration_hours(test_event) == 1.5
 
 
 if __name__ == "__main__":
-    # Set default domain if not provided
-    if "DOMAIN" not in os.environ:
-        print("⚠️  DOMAIN environment variable not set, using 'example.com'")
-        os.environ["DOMAIN"] = "example.com"
-    
-    success = test_cost_calculation()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(pytest.main([__file__, "-v", *sys.argv[1:]]))
\ No newline at end of file
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cron user loop in main.
+Per-user processing and Firestore sync token storage are monkeypatched, so no API access is needed.
+"""
+import sys
+import pytest
+
+if __name__ == "__main__":
+    import script_env  # noqa: F401  (src/ import path and .env when run as a script)
+
+import main
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Record save_sync_tokens calls; stored tokens are "old-<email>" for every user."""
+    calls = []
+    monkeypatch.setattr(main, "get_sync_tokens", lambda users: {email: f"old-{email}" for email in users})
+    monkeypatch.setattr(main, "save_sync_tokens", lambda tokens: calls.append(dict(tokens)))
+    return calls
+
+
+def fake_process_user(email, sync_token):
+    if email.startswith("bad"):
+        raise RuntimeError("calendar unavailable")
+    assert sync_token == f"old-{email}"
+    return 1, 2, 3, f"new-{email}"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Frozen time.monotonic; tests advance it by setting clock.step."""
+    class Clock:
+        step = 0
+        now = 0
+
+        def __call__(self):
+            self.now += self.step
+            return self.now
+
+    fake = Clock()
+    monkeypatch.setattr(main.time, "monotonic", fake)
+    return fake
+
+
+def users(count):
+    return [f"user{i}@example.com" for i in range(count)]
+
+
+def test_failed_user_token_not_saved(monkeypatch, saved, clock, capsys):
+    monkeypatch.setattr(main, "_process_user", fake_process_user)
+
+    assert main._process_users(["bad@example.com", *users(2)]) == (2, 4, 6)
+    assert saved == [{email: f"new-{email}" for email in users(2)}]
+    assert "Failed to process user bad@example.com: calendar unavailable" in capsys.readouterr().out
+
+
+def test_flush_at_user_count(monkeypatch, saved, clock):
+    monkeypatch.setattr(main, "_process_user", fake_process_user)
+    monkeypatch.setattr(main, "TOKEN_FLUSH_USERS", 2)
+
+    main._process_users(users(5))
+    # Two full flushes, then the final flush of the remaining user
+    assert [len(tokens) for tokens in saved] == [2, 2, 1]
+    assert {k: v for tokens in saved for k, v in tokens.items()} == {email: f"new-{email}" for email in users(5)}
+
+
+def test_flush_at_time_threshold(monkeypatch, saved, clock):
+    monkeypatch.setattr(main, "_process_user", fake_process_user)
+    clock.step = main.TOKEN_FLUSH_SECONDS
+
+    main._process_users(users(3))
+    assert [len(tokens) for tokens in saved] == [1, 1, 1]
+
+
+def test_final_flush_only(monkeypatch, saved, clock):
+    monkeypatch.setattr(main, "_process_user", fake_process_user)
+
+    main._process_users(users(3))
+    assert saved == [{email: f"new-{email}" for email in users(3)}]
+
+
+def test_no_save_without_tokens(monkeypatch, saved, clock):
+    monkeypatch.setattr(main, "_process_user", lambda email, sync_token: (0, 0, 0, None))
+
+    assert main._process_users(users(3)) == (0, 0, 0)
+    assert saved == []
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v", *sys.argv[1:]]))
\ No newline at end of file
@@ -6,128 +6,118 @@ Shows which meetings were processed and their costs.
 import sys
 import os
 import re
-from datetime import datetime, timezone, timedelta
-from pathlib import Path
-from dotenv import load_dotenv
+import logging
+import pytest
 
-# Add src directory to path to import our modules
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
-
-# Load .env file for configuration
-project_root = Path(__file__).parent.parent
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
+if __name__ == "__main__":
+    import script_env  # noqa: F401  (src/ import path and .env when run as a script)
 
 from auth import calendar_service
-from calendar_service import annotate_event
-from cost_calculator import compute_meeting_cost
+from calendar_service import annotation_request, BATCH_LIMIT
 from config import config
+from cost_calculator import compute_meeting_cost
+from event_search import iter_recent_events, get_full_event, is_internal_group_meeting
+
+# Per-event progress is logged at DEBUG
+log = logging.getLogger(__name__)
 
 
 def find_and_process_meetings(cal, calendar_id, max_meetings=3):
     """Find and process multiple internal meetings for testing."""
     print("🔍 Searching for internal meetings to process...")
     
-    now = datetime.now(timezone.utc)
-    days_back = 0
     total_checked = 0
-    processed = []
+    candidates = []
     max_search = 100
     
-    while len(processed) < max_meetings and total_checked < max_search:
-        # Search in 30-day windows going backwards
-        time_min = (now - timedelta(days=days_back + 30)).isoformat()
-        time_max = (now - timedelta(days=days_back)).isoformat()
-        
-        print(f"  📅 Searching {(now - timedelta(days=days_back + 30)).strftime('%Y-%m-%d')} to {(now - timedelta(days=days_back)).strftime('%Y-%m-%d')}")
-        
-        try:
-            events_result = cal.events().list(
-                calendarId=calendar_id,
-                timeMin=time_min,
-                timeMax=time_max,
-                maxResults=50,
-                singleEvents=True,
-                orderBy='startTime',
-                fields="items(id,summary,start,end,attendees,organizer,description,extendedProperties)"
-            ).execute()
+    try:
+        for event in iter_recent_events(cal, calendar_id):
+            if len(candidates) >= max_meetings or total_checked >= max_search:
+                break
+            total_checked += 1
+                
+            # We want timed, internal-only meetings with more than one attendee
+            if not is_internal_group_meeting(event):
+                continue
             
-            events = events_result.get('items', [])
-            print(f"  📊 Found {len(events)} events in this period")
+            # Calculate cost using new format on the full event (with response statuses)
+            event = get_full_event(cal, calendar_id, event['id'])
+            cost_info = compute_meeting_cost(event)
+            if cost_info['effective_cost'] < 0:
+                log.debug("    ⏭️  Skipping '%s': %s", event.get('summary', 'Untitled'), cost_info.get('skip_reason'))
+                continue
             
-            for event in events:
-                total_checked += 1
-                if len(processed) >= max_meetings:
-                    break
-                    
-                # Check if event has start/end times (not all-day)
-                if 'dateTime' not in event.get('start', {}):
-                    continue
-                    
-                # Check if event has attendees
-                attendees = event.get('attendees', [])
-                if not attendees:
-                    continue
-                
-                # Filter to only internal attendees
-                internal_attendees = [a for a in attendees if a.get('email', '').endswith(f"@{config.domain}")]
-                external_attendees = [a for a in attendees if not a.get('email', '').endswith(f"@{config.domain}")]
-                
-                # Skip if no internal attendees
-                if not internal_attendees:
-                    continue
-                
-                # For this test, we want internal-only meetings
-                if external_attendees:
-                    continue
-                
-                # Calculate cost using new format
-                cost_info = compute_meeting_cost(event)
-                if cost_info['effective_cost'] < 0:
-                    if cost_info.get('skip_reason') == 'solo_meeting':
-                        print(f"    ⏭️  Skipping solo meeting: '{event.get('summary', 'Untitled')}'")
-                    continue
+            log.debug("  🎯 Processing: '%s'", event.get('summary', 'Untitled'))
+            candidates.append((event, cost_info))
                 
-                # Process this meeting
-                try:
-                    print(f"  🎯 Processing: '{event.get('summary', 'Untitled')}'")
-                    annotate_event(cal, calendar_id, event, cost_info)
-                    
-                    processed.append({
-                        'title': event.get('summary', 'Untitled'),
-                        'event_id': event['id'],
-                        'start': event['start']['dateTime'],
-                        'effective_cost': cost_info['effective_cost'],
-                        'invited_cost': cost_info['invited_cost'],
-                        'effective_count': cost_info['effective_count'],
-                        'invited_count': cost_info['invited_count'],
-                        'duration': cost_info['hours'],
-                        'has_dual_cost': cost_info['invited_cost'] != cost_info['effective_cost']
-                    })
-                    
-                    if cost_info['invited_cost'] != cost_info['effective_cost']:
-                        print(f"      ✅ Annotated with dual costs: ${cost_info['effective_cost']} effective, ${cost_info['invited_cost']} invited")
-                    else:
-                        print(f"      ✅ Annotated with cost: ${cost_info['effective_cost']}")
-                    
-                except Exception as e:
-                    print(f"      ❌ Failed to annotate: {e}")
-                    
-        except Exception as e:
-            print(f"  ❌ Error searching events: {e}")
-            break
+    except Exception as e:
+        print(f"  ❌ Error searching events: {e}")
+    
+    return annotate_meetings(cal, calendar_id, candidates)
+
+
+def annotate_meetings(cal, calendar_id, candidates):
+    """
+    Annotate (event, cost_info) pairs with batch requests and return the processed meeting summaries.
+    Meetings already annotated with the same costs are not patched and are reported as unchanged.
+    """
+    annotated = [False] * len(candidates)
+    unchanged = [False] * len(candidates)
+    
+    def on_patch_done(request_id, response, exception):
+        event = candidates[int(request_id)][0]
+        if exception is not None:
+            print(f"      ❌ Failed to annotate '{event.get('summary', 'Untitled')}': {exception}")
+        else:
+            annotated[int(request_id)] = True
+    
+    for offset in range(0, len(candidates), BATCH_LIMIT):
+        batch = cal.new_batch_http_request(callback=on_patch_done)
+        pending = 0
+        for i in range(offset, min(offset + BATCH_LIMIT, len(candidates))):
+            event, cost_info = candidates[i]
+            request = annotation_request(cal, calendar_id, event, cost_info)
+            if request is None:
+                # Already annotated with the same costs
+                unchanged[i] = True
+                continue
+            batch.add(request, request_id=str(i))
+            pending += 1
+        if pending:
+            try:
+                batch.execute()
+            except Exception as e:
+                print(f"      ❌ Failed to annotate {pending} meetings: {e}")
+    
+    processed = []
+    for (event, cost_info), ok, same in zip(candidates, annotated, unchanged):
+        if not (ok or same):
+            continue
         
-        # Move to next time window
-        days_back += 30
+        processed.append({
+            'title': event.get('summary', 'Untitled'),
+            'event_id': event['id'],
+            'start': event['start']['dateTime'],
+            'effective_cost': cost_info['effective_cost'],
+            'invited_cost': cost_info['invited_cost'],
+            'effective_count': cost_info['effective_count'],
+            'invited_count': cost_info['invited_count'],
+            'duration': cost_info['hours'],
+            'has_dual_cost': cost_info['invited_cost'] != cost_info['effective_cost'],
+            'unchanged': same
+        })
         
-        if not events:
-            continue
+        if same:
+            print(f"      ⏸️  Unchanged '{event.get('summary', 'Untitled')}': already annotated with cost ${cost_info['effective_cost']}")
+        elif cost_info['invited_cost'] != cost_info['effective_cost']:
+            print(f"      ✅ Annotated '{event.get('summary', 'Untitled')}' with dual costs: ${cost_info['effective_cost']} effective, ${cost_info['invited_cost']} invited")
+        else:
+            print(f"      ✅ Annotated '{event.get('summary', 'Untitled')}' with cost: ${cost_info['effective_cost']}")
     
     return processed
 
 
-def test_multiple_meetings():
+def run_multiple_meetings(cal=None):
     """Test multiple meeting annotations for QA."""
     print("🧪 Testing Multiple Meeting Annotations for QA")
     print("=" * 60)
@@ -147,7 +137,7 @@ def test_multiple_meetings():
     try:
         # Authenticate
         print("🔐 Authenticating with Google Calendar API...")
-        cal = calendar_service(test_user_email)
+        cal = cal or calendar_service(test_user_email)
         print(f"  ✅ Authenticated as: {test_user_email}")
         print()
         
@@ -162,6 +152,7 @@ def test_multiple_meetings():
             print("❌ No internal meetings found to process")
             return False
         
+        default_rate = config.default_rate
         for i, meeting in enumerate(processed, 1):
             # Determine cost category for effective cost
             effective_cost = meeting['effective_cost']
@@ -186,11 +177,15 @@ def test_multiple_meetings():
                 print(f"   💸 Invited Cost: ${invited_cost} ({invited_category})")
                 print(f"   👥 Attendance: {meeting['invited_count']} invited → {meeting['effective_count']} attending")
             
-            print(f"   📊 Details: {meeting['effective_count']} attendees × {meeting['duration']}h × ${config.default_rate}/h")
+            print(f"   📊 Details: {meeting['effective_count']} attendees × {meeting['duration']}h × ${default_rate}/h")
             print(f"   📅 When: {meeting['start']}")
             print(f"   🔗 Event ID: {meeting['event_id']}")
+            if meeting['unchanged']:
+                print("   ⏸️  Unchanged: already annotated with these costs, not modified")
             
-        print(f"\n✅ Successfully processed {len(processed)} meetings")
+        unchanged = sum(meeting['unchanged'] for meeting in processed)
+        print(f"\n✅ Successfully processed {len(processed)} meetings "
+              f"({len(processed) - unchanged} annotated, {unchanged} unchanged)")
         print("👀 Please check your Google Calendar to verify the cost annotations appear correctly")
         print("   - Costs should appear at the top of event descriptions")
         print("   - Colors/emojis should match the cost levels shown above")
@@ -202,6 +197,13 @@ def test_multiple_meetings():
         return False
 
 
+
+@pytest.mark.integration
+def test_multiple_meetings(cal):
+    """Annotate several real meetings for manual QA (modifies events)."""
+    assert run_multiple_meetings(cal)
+
+
 if __name__ == "__main__":
-    success = test_multiple_meetings()
+    success = run_multiple_meetings()
     sys.exit(0 if success else 1)
\ No newline at end of file
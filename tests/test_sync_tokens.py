@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Unit tests for sync token storage in Firestore.
+The Firestore REST session is replaced by a recording stub, so no API access is needed.
+"""
+import sys
+import zlib
+import pytest
+
+
+@pytest.mark.parametrize("email, shard", [
+    ("alice@example.com", 1),
+    ("bob@example.com", 2),
+    ("carol@example.com", 3),
+    ("first.last+cal@example.com", 1),
+])
+def test_shard_choice_is_stable(email, shard):
+    # crc32 is deterministic across processes, unlike hash() of a str
+    assert zlib.crc32(email.encode()) % calendar_service.SYNC_TOKEN_SHARDS == shard
+    assert user_doc(email).endswith(f"/meetingcost/_sync_tokens_{shard}")
+
+
+def test_save_sync_tokens_one_write_per_shard(session):
+    tokens = {f"user{i}@example.com": f"tok-{i}" for i in range(40)}
+    save_sync_tokens(tokens)
+
+    assert len(session.posts) == 1
+    writes = session.posts[0][1]["writes"]
+    names = [write["update"]["name"] for write in writes]
+    assert sorted(names) == sorted({user_doc(email) for email in tokens})
+    written = {}
+    for write in writes:
+        fields = write["update"]["fields"]
+        assert all(user_doc(email) == write["update"]["name"] for email in fields)
+        assert write["updateMask"]["fieldPaths"] == [_field_path(email) for email in fields]
+        written.update({email: value["stringValue"] for email, value in fields.items()})
+    assert written == tokens
+
+
+def test_legacy_lookup_only_for_missing_users_in_chunks(session, monkeypatch):
+    monkeypatch.setattr(calendar_service, "LEGACY_GET_CHUNK", 2)
+    alice, bob, carol, dave = "alice@example.com", "bob@example.com", "carol@example.com", "dave@example.com"
+    new_users = [f"new{i}@example.com" for i in range(3)]
+    emails = [alice, bob, carol, dave, *new_users]
+    missing = [bob, carol, *new_users]
+    session.responses = [
+        [shard_doc(user_doc(alice), {alice: "tok-a", dave: "tok-d"})],
+        [{"found": {"name": legacy_user_doc(bob), "fields": {"syncToken": {"stringValue": "tok-b"}}}},
+         {"missing": legacy_user_doc(carol)}],
+        [{"missing": legacy_user_doc(new_users[0])}, {"missing": legacy_user_doc(new_users[1])}],
+        [{"missing": legacy_user_doc(new_users[2])}],
+    ]
+
+    assert get_sync_tokens(emails) == {alice: "tok-a", dave: "tok-d", bob: "tok-b"}
+    legacy_gets = [body["documents"] for url, body in session.posts[1:4]]
+    assert all(url == BATCH_GET_URL for url, body in session.posts[:4])
+    assert legacy_gets == [[legacy_user_doc(email) for email in missing[i:i + 2]] for i in range(0, len(missing), 2)]
+
+    # Tokens found in legacy documents are copied into the shards
+    assert session.posts[4:] == [(COMMIT_URL, {"writes": [{
+        "update": {"name": user_doc(bob), "fields": {bob: {"stringValue": "tok-b"}}},
+        "updateMask": {"fieldPaths": [_field_path(bob)]},
+    }]})]
+
+
+def test_no_legacy_lookup_when_all_users_in_shards(session):
+    alice, dave = "alice@example.com", "dave@example.com"
+    session.responses = [[shard_doc(user_doc(alice), {alice: "tok-a", dave: "tok-d"})]]
+
+    assert get_sync_tokens([alice, dave]) == {alice: "tok-a", dave: "tok-d"}
+    assert len(session.posts) == 1
+
+
+if __name__ == "__main__":
+    import script_env  # noqa: F401  (src/ import path and .env when run as a script)
+
+import calendar_service
+from calendar_service import (
+    user_doc, legacy_user_doc, _field_path,
+    save_sync_tokens, get_sync_tokens, _get_legacy_sync_tokens,
+)
+
+
+COMMIT_URL = f"{calendar_service._DOCUMENTS_URL}:commit"
+BATCH_GET_URL = f"{calendar_service._DOCUMENTS_URL}:batchGet"
+
+
+class FakeResponse:
+    """Minimal requests.Response stand-in."""
+
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class RecordingSession:
+    """AuthorizedSession stand-in that records posts and replies with queued JSON bodies."""
+
+    def __init__(self):
+        self.posts = []
+        self.responses = []
+
+    def post(self, url, json):
+        self.posts.append((url, json))
+        return FakeResponse(self.responses.pop(0) if self.responses else {})
+
+
+@pytest.fixture
+def session(monkeypatch):
+    fake = RecordingSession()
+    monkeypatch.setattr(calendar_service, "firestore_session", fake)
+    return fake
+
+
+def shard_doc(name, fields):
+    """Build a batchGet "found" result with string fields."""
+    return {"found": {"name": name, "fields": {k: {"stringValue": v} for k, v in fields.items()}}}
+
+
+@pytest.mark.parametrize("email, expected", [
+    ("alice@example.com", "`alice@example.com`"),
+    ("first.last+cal@example.com", "`first.last+cal@example.com`"),
+    ("we`ird@example.com", "`we\\`ird@example.com`"),
+    ("back\\slash@example.com", "`back\\\\slash@example.com`"),
+])
+def test_field_path(email, expected):
+    assert _field_path(email) == expected
+
+
+def test_user_doc_names():
+    assert user_doc("alice@example.com") == f"{calendar_service._DATABASE}/documents/meetingcost/_sync_tokens_1"
+    assert legacy_user_doc("alice@example.com") == f"{calendar_service._DATABASE}/documents/meetingcost/alice@example.com"
+
+
+@pytest.mark.parametrize("email", ["alice@example.com", "first.last+cal@example.com", "we`ird@example.com"])
+def test_save_sync_tokens_commit_payload(session, email):
+    save_sync_tokens({email: "tok"})
+
+    assert session.posts == [(COMMIT_URL, {"writes": [{
+        "update": {"name": user_doc(email), "fields": {email: {"stringValue": "tok"}}},
+        "updateMask": {"fieldPaths": [_field_path(email)]},
+    }]})]
+
+
+def test_get_sync_tokens_batch_get_payload_and_parsing(session):
+    alice, bob = "alice@example.com", "bob@example.com"
+    session.responses = [
+        [shard_doc(user_doc(alice), {alice: "tok-a", "other@example.com": "tok-o"}),
+         {"missing": user_doc(bob)}],
+        [{"missing": legacy_user_doc(bob)}],
+    ]
+
+    assert get_sync_tokens([alice, bob]) == {alice: "tok-a"}
+    assert session.posts == [
+        (BATCH_GET_URL, {"documents": sorted([user_doc(alice), user_doc(bob)])}),
+        (BATCH_GET_URL, {"documents": [legacy_user_doc(bob)]}),
+    ]
+
+
+def test_get_sync_tokens_without_users(session):
+    assert get_sync_tokens([]) == {}
+    assert session.posts == []
+
+
+def test_get_legacy_sync_tokens_parsing(session):
+    alice, bob, carol = "alice@example.com", "first.last+cal@example.com", "carol@example.com"
+    session.responses = [[
+        {"found": {"name": legacy_user_doc(alice), "fields": {"syncToken": {"stringValue": "tok-a"}}}},
+        {"found": {"name": legacy_user_doc(bob), "fields": {}}},
+        {"missing": legacy_user_doc(carol)},
+    ]]
+
+    assert _get_legacy_sync_tokens([alice, bob, carol]) == {alice: "tok-a"}
+    assert session.posts == [
+        (BATCH_GET_URL, {"documents": [legacy_user_doc(alice), legacy_user_doc(bob), legacy_user_doc(carol)]}),
+    ]
+
+
+
+@pytest.mark.parametrize("email, shard", [
+    ("alice@example.com", 1),
+    ("bob@example.com", 2),
+    ("carol@example.com", 3),
+    ("first.last+cal@example.com", 1),
+])
+def test_shard_choice_is_stable(email, shard):
+    # crc32 is deterministic across processes, unlike hash() of a str
+    assert zlib.crc32(email.encode()) % calendar_service.SYNC_TOKEN_SHARDS == shard
+    assert user_doc(email).endswith(f"/meetingcost/_sync_tokens_{shard}")
+
+
+def test_save_sync_tokens_one_write_per_shard(session):
+    tokens = {f"user{i}@example.com": f"tok-{i}" for i in range(40)}
+    save_sync_tokens(tokens)
+
+    assert len(session.posts) == 1
+    writes = session.posts[0][1]["writes"]
+    names = [write["update"]["name"] for write in writes]
+    assert sorted(names) == sorted({user_doc(email) for email in tokens})
+    written = {}
+    for write in writes:
+        fields = write["update"]["fields"]
+        assert all(user_doc(email) == write["update"]["name"] for email in fields)
+        assert write["updateMask"]["fieldPaths"] == [_field_path(email) for email in fields]
+        written.update({email: value["stringValue"] for email, value in fields.items()})
+    assert written == tokens
+
+
+def test_legacy_lookup_only_for_missing_users_in_chunks(session, monkeypatch):
+    monkeypatch.setattr(calendar_service, "LEGACY_GET_CHUNK", 2)
+    alice, bob, carol, dave = "alice@example.com", "bob@example.com", "carol@example.com", "dave@example.com"
+    new_users = [f"new{i}@example.com" for i in range(3)]
+    emails = [alice, bob, carol, dave, *new_users]
+    missing = [bob, carol, *new_users]
+    session.responses = [
+        [shard_doc(user_doc(alice), {alice: "tok-a", dave: "tok-d"})],
+        [{"found": {"name": legacy_user_doc(bob), "fields": {"syncToken": {"stringValue": "tok-b"}}}},
+         {"missing": legacy_user_doc(carol)}],
+        [{"missing": legacy_user_doc(new_users[0])}, {"missing": legacy_user_doc(new_users[1])}],
+        [{"missing": legacy_user_doc(new_users[2])}],
+    ]
+
+    assert get_sync_tokens(emails) == {alice: "tok-a", dave: "tok-d", bob: "tok-b"}
+    legacy_gets = [body["documents"] for url, body in session.posts[1:4]]
+    assert all(url == BATCH_GET_URL for url, body in session.posts[:4])
+    assert legacy_gets == [[legacy_user_doc(email) for email in missing[i:i + 2]] for i in range(0, len(missing), 2)]
+
+    # Tokens found in legacy documents are copied into the shards
+    assert session.posts[4:] == [(COMMIT_URL, {"writes": [{
+        "update": {"name": user_doc(bob), "fields": {bob: {"stringValue": "tok-b"}}},
+        "updateMask": {"fieldPaths": [_field_path(bob)]},
+    }]})]
+
+
+def test_no_legacy_lookup_when_all_users_in_shards(session):
+    alice, dave = "alice@example.com", "dave@example.com"
+    session.responses = [[shard_doc(user_doc(alice), {alice: "tok-a", dave: "tok-d"})]]
+
+    assert get_sync_tokens([alice, dave]) == {alice: "tok-a", dave: "tok-d"}
+    assert len(session.posts) == 1
+
+
+if __name__ == "__main__":
+    sys.exit(pytest.main([__file__, "-v", *sys.argv[1:]]))
\ No newline at end of file